@@ -1,11 +1,14 @@
 """Docker MCP Gateway 入口模块"""
 
+import asyncio
+import errno
 import logging
 import os
 import signal
 import socket
 import subprocess
 import sys
+import time
 
 import uvicorn
 
@@ -27,51 +30,195 @@ def setup_logging() -> None:
     logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 
+# 通配地址无法直接连接，探测时改用对应协议族的回环地址
+_WILDCARD_PROBE_HOSTS = {"0.0.0.0": "127.0.0.1", "::": "::1"}
+
+
+def _resolve_address(host: str, port: int) -> tuple[int, tuple]:
+    """解析地址，返回 (协议族, sockaddr)，支持 IPv4 与 IPv6"""
+    family, _, _, _, sockaddr = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+    )[0]
+    return family, sockaddr
+
+
+def _can_bind(host: str, port: int) -> bool:
+    """通过 bind 探测端口是否可用
+    
+    设置 SO_REUSEADDR，避免上次关闭遗留的 TIME_WAIT 连接造成误判；
+    真正处于 LISTEN 的端口仍会返回 EADDRINUSE。
+    """
+    try:
+        family, sockaddr = _resolve_address(host, port)
+        with socket.socket(family, socket.SOCK_STREAM) as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind(sockaddr)
+            return True
+    except OSError:
+        return False
+
+
 def is_port_in_use(port: int, host: str = "0.0.0.0") -> bool:
-    """检查端口是否被占用"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    """检查端口是否被占用
+    
+    通过 connect_ex 探测是否有进程在监听，避免与随后 uvicorn 的 bind 竞争。
+    连接结果不确定时（超时、地址不可达等）回退到 bind 探测。
+    """
+    # 无法连接通配地址，改为探测本机回环地址
+    probe_host = _WILDCARD_PROBE_HOSTS.get(host, host)
+    try:
+        family, sockaddr = _resolve_address(probe_host, port)
+        with socket.socket(family, socket.SOCK_STREAM) as s:
+            s.settimeout(0.1)
+            rc = s.connect_ex(sockaddr)
+    except OSError:
+        rc = None
+    
+    if rc == 0:
+        return True
+    if rc == errno.ECONNREFUSED:
+        return False
+    return not _can_bind(host, port)
+
+
+def _find_listen_inodes_linux(port: int) -> set[str]:
+    """读取 /proc/net/tcp[6]，返回监听指定端口的 socket 标识 (Linux)
+    
+    Returns:
+        set of "socket:[inode]" strings
+    """
+    # /proc/net/tcp 中端口为 4 位大写十六进制，直接比较字符串后缀，无需逐行 int() 解析
+    target_suffix = f":{port:04X}"
+    inodes = set()
+    for path in ("/proc/net/tcp", "/proc/net/tcp6"):
         try:
-            s.bind((host, port))
-            return False
+            with open(path, encoding="ascii") as f:
+                next(f, None)  # 跳过表头
+                for line in f:
+                    fields = line.split()
+                    # fields: sl local_address rem_address st ... inode
+                    if len(fields) < 10 or fields[3] != "0A":
+                        continue
+                    if fields[1].endswith(target_suffix):
+                        inodes.add(f"socket:[{fields[9]}]")
         except OSError:
-            return True
+            pass
+    return inodes
+
+
+def _find_pids_on_port_linux(port: int) -> list[int]:
+    """通过 /proc 查找监听指定端口的进程 (Linux)
+    
+    读取 /proc/net/tcp[6] 获取处于 LISTEN 状态的 socket inode，
+    再遍历 /proc/[pid]/fd 匹配 socket:[inode]，无需 fork lsof/ps。
+    """
+    inodes = _find_listen_inodes_linux(port)
+    if not inodes:
+        return []
+    
+    pids = []
+    with os.scandir("/proc") as proc_entries:
+        for entry in proc_entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with os.scandir(f"/proc/{entry.name}/fd") as fd_entries:
+                    for fd in fd_entries:
+                        try:
+                            if os.readlink(fd.path) in inodes:
+                                pids.append(int(entry.name))
+                                break
+                        except OSError:
+                            continue
+            except OSError:
+                # 进程已退出或无权限访问
+                continue
+    return pids
+
+
+def _read_process_name_linux(pid: int) -> str:
+    """读取进程名 (Linux)"""
+    try:
+        with open(f"/proc/{pid}/comm", encoding="utf-8", errors="replace") as f:
+            return f.read().strip() or "unknown"
+    except OSError:
+        return "unknown"
 
 
 def find_process_on_port(port: int) -> list[tuple[int, str]]:
     """查找占用指定端口的进程
     
+    Linux 下直接解析 /proc，其他平台（macOS）回退到 lsof。
+    
     Returns:
         list of (pid, process_name) tuples
     """
+    if sys.platform == "linux":
+        return [(pid, _read_process_name_linux(pid)) for pid in _find_pids_on_port_linux(port)]
+    
     processes = []
     try:
-        # macOS/Linux: 使用 lsof
+        # macOS: 单次 lsof 调用，-F 输出 p<pid> / c<command> 记录
         result = subprocess.run(
-            ["lsof", "-i", f":{port}", "-t"],
+            ["lsof", "-nP", f"-iTCP:{port}", "-sTCP:LISTEN", "-Fpc"],
             capture_output=True,
             text=True,
+            timeout=2,
         )
-        if result.returncode == 0 and result.stdout.strip():
-            pids = result.stdout.strip().split('\n')
-            for pid_str in pids:
-                try:
-                    pid = int(pid_str.strip())
-                    # 获取进程名
-                    ps_result = subprocess.run(
-                        ["ps", "-p", str(pid), "-o", "comm="],
-                        capture_output=True,
-                        text=True,
-                    )
-                    name = ps_result.stdout.strip() if ps_result.returncode == 0 else "unknown"
-                    processes.append((pid, name))
-                except ValueError:
-                    pass
+        if result.returncode == 0:
+            pid = None
+            for line in result.stdout.splitlines():
+                if line.startswith("p"):
+                    if pid is not None:
+                        processes.append((pid, "unknown"))
+                    try:
+                        pid = int(line[1:])
+                    except ValueError:
+                        pid = None
+                elif line.startswith("c") and pid is not None:
+                    processes.append((pid, line[1:] or "unknown"))
+                    pid = None
+            if pid is not None:
+                processes.append((pid, "unknown"))
     except FileNotFoundError:
-        # lsof 不存在，尝试其他方法
+        # lsof 不存在
         pass
+    except subprocess.TimeoutExpired:
+        logging.getLogger(__name__).warning("lsof 查询端口 %d 超时", port)
     return processes
 
 
+def _is_port_listening(port: int) -> bool:
+    """检查端口是否仍在监听（用于清理后的轮询）
+    
+    Linux 下直接读取 /proc 监听表，轮询期间无需反复创建探测 socket。
+    """
+    if sys.platform == "linux":
+        return bool(_find_listen_inodes_linux(port))
+    return is_port_in_use(port)
+
+
+def _reap_exited_children(pids: set[int]) -> bool:
+    """回收已退出的子进程
+    
+    Returns:
+        bool: pids 全部是本进程的子进程且均已退出
+    """
+    all_exited = True
+    for pid in list(pids):
+        try:
+            exited, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            # 不是本进程的子进程，无法直接等待
+            all_exited = False
+            continue
+        if exited:
+            pids.discard(pid)
+        else:
+            all_exited = False
+    return all_exited
+
+
 def kill_process_on_port(port: int, force: bool = False) -> bool:
     """清理占用端口的进程
     
@@ -88,31 +235,71 @@ def kill_process_on_port(port: int, force: bool = False) -> bool:
     if not processes:
         return True
     
+    sig = signal.SIGKILL if force else signal.SIGTERM
+    own_pgid = os.getpgrp()
+    
+    # 占用进程自身是进程组组长时向整个组发送信号（一并清理其 worker 子进程）；
+    # 否则只杀该进程本身，避免误杀同组的其他进程（例如与 dockerd 同组的 docker-proxy）
+    pgids: dict[int, list[int]] = {}
+    single_pids: list[int] = []
     for pid, name in processes:
         logger.warning("发现端口 %d 被进程占用: PID=%d (%s)", port, pid, name)
-        
         try:
-            sig = signal.SIGKILL if force else signal.SIGTERM
-            os.kill(pid, sig)
-            logger.info("已发送信号到进程 %d", pid)
+            pgid = os.getpgid(pid)
         except ProcessLookupError:
             logger.debug("进程 %d 已不存在", pid)
+            continue
+        if pgid == pid and pgid != own_pgid:
+            pgids.setdefault(pgid, []).append(pid)
+        else:
+            single_pids.append(pid)
+    
+    targets = [(os.killpg, pgid, pids) for pgid, pids in pgids.items()]
+    targets += [(os.kill, pid, [pid]) for pid in single_pids]
+    for kill, target, pids in targets:
+        try:
+            kill(target, sig)
+            logger.info("已发送信号到进程 %s", ", ".join(str(pid) for pid in pids))
+        except ProcessLookupError:
+            logger.debug("进程 %s 已不存在", ", ".join(str(pid) for pid in pids))
         except PermissionError:
-            logger.error("无权限杀死进程 %d，请使用 sudo 或手动清理", pid)
+            logger.error("无权限杀死进程 %s，请使用 sudo 或手动清理", ", ".join(str(pid) for pid in pids))
             return False
     
-    # 等待端口释放
-    import time
-    for _ in range(10):
-        time.sleep(0.5)
-        if not is_port_in_use(port):
+    # 等待端口释放（指数退避，最长约 5 秒）
+    # 子进程可直接通过 waitpid 判断退出，其余进程回退到端口探测
+    pending = {pid for pid, _ in processes}
+    delay = 0.02
+    for _ in range(14):
+        time.sleep(delay)
+        if _reap_exited_children(pending) or not _is_port_listening(port):
             logger.info("端口 %d 已释放", port)
             return True
+        delay = min(delay * 1.7, 0.5)
     
     logger.error("端口 %d 仍被占用", port)
     return False
 
 
+def create_listen_socket(host: str, port: int) -> socket.socket:
+    """创建并绑定监听 socket，交给 uvicorn 直接使用
+    
+    Raises:
+        OSError: 绑定失败
+    """
+    # 按地址选择协议族，支持 IPv6（如 HOST=::）
+    family, sockaddr = _resolve_address(host, port)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(sockaddr)
+        sock.listen(128)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
 def main() -> None:
     """主入口函数"""
     setup_logging()
@@ -140,6 +327,18 @@ def main() -> None:
             logger.info("可以运行: kill -9 $(lsof -t -i:%d)", port)
             sys.exit(1)
     
+    # 自行绑定端口，避免探测与 uvicorn 再次 bind 之间的竞争
+    try:
+        sock = create_listen_socket(host, port)
+    except OSError as e:
+        if e.errno != errno.EADDRINUSE:
+            raise
+        logger.error("端口 %d 被占用，尝试强制清理...", port)
+        if not kill_process_on_port(port, force=True):
+            logger.error("启动失败: %s", e)
+            sys.exit(1)
+        sock = create_listen_socket(host, port)
+    
     logger.info("=" * 50)
     logger.info("Docker MCP Gateway 启动")
     logger.info("=" * 50)
@@ -150,29 +349,28 @@ def main() -> None:
     logger.info("=" * 50)
     
     # 启动服务器
+    config = uvicorn.Config(
+        "docker_mcp_gateway.app:app",
+        host=host,
+        port=port,
+        log_level=os.getenv("LOG_LEVEL", "info").lower(),
+    )
+    server = uvicorn.Server(config)
+    
+    def handle_exit(signum: int, frame) -> None:
+        """收到 SIGINT/SIGTERM 时通知 uvicorn 优雅退出"""
+        if not server.should_exit:
+            logger.info("收到信号 %s，正在关闭...", signal.Signals(signum).name)
+        server.should_exit = True
+    
+    # uvicorn 运行期间会临时接管信号，退出后恢复为这里的处理函数
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, handle_exit)
+    
     try:
-        uvicorn.run(
-            "docker_mcp_gateway.app:app",
-            host=host,
-            port=port,
-            log_level=os.getenv("LOG_LEVEL", "info").lower(),
-        )
-    except OSError as e:
-        if "address already in use" in str(e).lower():
-            logger.error("端口 %d 被占用，尝试清理并重启...", port)
-            if kill_process_on_port(port, force=True):
-                # 重试启动
-                uvicorn.run(
-                    "docker_mcp_gateway.app:app",
-                    host=host,
-                    port=port,
-                    log_level=os.getenv("LOG_LEVEL", "info").lower(),
-                )
-            else:
-                logger.error("启动失败: %s", e)
-                sys.exit(1)
-        else:
-            raise
+        asyncio.run(server.serve(sockets=[sock]))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
 
 
 if __name__ == "__main__":
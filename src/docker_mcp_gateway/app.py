@@ -1,7 +1,11 @@
 """FastAPI 应用主模块"""
 
+import asyncio
+import hashlib
 import logging
+import mimetypes
 import os
+import time
 from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
@@ -9,20 +13,20 @@ from typing import Any
 
 from fastapi import FastAPI, HTTPException, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
 from pydantic import BaseModel
 
 from .config import ConfigManager
 from .docker_manager import DockerManager
 from .models import GatewayStatus
-from .proxy import cleanup_proxy, get_proxy_client, get_websocket_proxy
+from .proxy import ProxyClient, cleanup_proxy, get_websocket_proxy, init_proxy_client
 
 logger = logging.getLogger(__name__)
 
 # 全局变量
 _docker_manager: DockerManager | None = None
 _gateway_status: GatewayStatus | None = None
+_proxy_client: ProxyClient | None = None
 
 
 # ==================== Pydantic 模型 ====================
@@ -63,14 +67,17 @@ class StatusResponse(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global _docker_manager, _gateway_status
+    global _docker_manager, _gateway_status, _proxy_client
     
     logger.info("Docker MCP Gateway 启动中...")
     
     # 初始化配置管理器
     config_dir = os.getenv("CONFIG_DIR", "./config")
     data_dir = os.getenv("DATA_DIR", "./data")
-    config_manager = ConfigManager(config_dir=config_dir, data_dir=data_dir)
+    # 加载配置涉及文件读写，放到线程中执行
+    config_manager = await asyncio.to_thread(
+        ConfigManager, config_dir=config_dir, data_dir=data_dir
+    )
     
     # 初始化 Docker 管理器
     _docker_manager = DockerManager(config_manager)
@@ -79,6 +86,9 @@ async def lifespan(app: FastAPI):
     # 初始化网关状态
     _gateway_status = GatewayStatus(start_time=datetime.now())
     
+    # 代理客户端（启动时创建，请求路径上直接使用，无需每次获取单例）
+    _proxy_client = await init_proxy_client()
+    
     logger.info("Docker MCP Gateway 启动完成")
     
     yield
@@ -90,6 +100,7 @@ async def lifespan(app: FastAPI):
         await _docker_manager.cleanup()
     
     await cleanup_proxy()
+    _proxy_client = None
     
     logger.info("Docker MCP Gateway 已关闭")
 
@@ -138,9 +149,36 @@ def _setup_static_files(app: FastAPI) -> None:
             web_dir = path
             break
     
-    if web_dir:
-        logger.info("静态文件目录: %s", web_dir)
-        app.mount("/static", StaticFiles(directory=web_dir), name="static")
+    if not web_dir:
+        return
+    
+    logger.info("静态文件目录: %s", web_dir)
+    
+    # 前端资源很小且固定，启动时一次性读入内存，请求时不再访问文件系统
+    assets: dict[str, tuple[bytes, str, str]] = {}
+    for path in web_dir.rglob("*"):
+        if not path.is_file():
+            continue
+        content = path.read_bytes()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        assets[path.relative_to(web_dir).as_posix()] = (content, media_type, etag)
+    
+    logger.info("已加载 %d 个静态文件", len(assets))
+    
+    @app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+    async def static_file(path: str, request: Request):
+        """返回预加载的静态文件"""
+        asset = assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        
+        content, media_type, etag = asset
+        # no-cache: 浏览器每次用 ETag 重新验证，重新部署后立即生效
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=content, media_type=media_type, headers=headers)
 
 
 def _register_routes(app: FastAPI) -> None:
@@ -170,7 +208,7 @@ def _register_routes(app: FastAPI) -> None:
         running_count = sum(1 for c in containers if c.status == "running")
         total_requests = sum(c.stats.total_requests for c in containers)
         
-        uptime = (datetime.now() - _gateway_status.start_time).total_seconds()
+        uptime = time.monotonic() - _gateway_status.start_monotonic
         
         return StatusResponse(
             start_time=_gateway_status.start_time.isoformat(),
@@ -181,8 +219,8 @@ def _register_routes(app: FastAPI) -> None:
             memory_usage_mb=0.0,  # TODO: 计算总内存
         )
     
-    @app.get("/api/containers")
-    async def list_containers() -> list[ContainerResponse]:
+    @app.get("/api/containers", response_model=list[ContainerResponse])
+    async def list_containers():
         """列出所有容器"""
         if not _docker_manager:
             raise HTTPException(status_code=503, detail="服务未就绪")
@@ -190,26 +228,28 @@ def _register_routes(app: FastAPI) -> None:
         containers = _docker_manager.get_all_containers()
         result = []
         
+        # 数据来自内部 dataclass，直接构造 dict 并返回 JSONResponse，
+        # 跳过逐个 Pydantic 模型的构造与响应校验（response_model 仅用于文档）
         for info in containers:
-            # 获取资源统计
-            stats = await _docker_manager.get_container_stats(info.name)
+            # 资源统计由后台任务定期刷新
+            stats = _docker_manager.get_cached_stats(info.name)
             
-            result.append(ContainerResponse(
-                name=info.name,
-                status=info.status,
-                image=info.config.image,
-                internal_port=info.config.internal_port,
-                host_port=info.host_port or info.config.host_port,
-                external_path=info.external_path or f"/mcp/{info.name}",
-                internal_url=info.internal_url,
-                health_status=info.health_status,
-                total_requests=info.stats.total_requests,
-                memory_mb=stats.get('memory_mb', 0.0),
-                cpu_percent=stats.get('cpu_percent', 0.0),
-                error_message=info.error_message,
-            ))
+            result.append({
+                "name": info.name,
+                "status": info.status,
+                "image": info.config.image,
+                "internal_port": info.config.internal_port,
+                "host_port": info.host_port or info.config.host_port,
+                "external_path": info.external_path or f"/mcp/{info.name}",
+                "internal_url": info.internal_url,
+                "health_status": info.health_status,
+                "total_requests": info.stats.total_requests,
+                "memory_mb": stats.get('memory_mb', 0.0),
+                "cpu_percent": stats.get('cpu_percent', 0.0),
+                "error_message": info.error_message,
+            })
         
-        return result
+        return JSONResponse(content=result)
     
     @app.post("/api/containers", status_code=201)
     async def create_container(req: CreateContainerRequest) -> ContainerResponse:
@@ -317,13 +357,18 @@ def _register_routes(app: FastAPI) -> None:
     
     # ==================== MCP 代理路由 ====================
     
+    # /mcp/{server_name} 与 /mcp/{server_name}/{path} 共用同一处理函数
+    @app.api_route(
+        "/mcp/{server_name}",
+        methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
+    )
     @app.api_route(
         "/mcp/{server_name}/{path:path}",
         methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
     )
-    async def proxy_mcp_request(server_name: str, path: str, request: Request):
+    async def proxy_mcp_request(server_name: str, request: Request):
         """代理 MCP 请求到对应容器"""
-        if not _docker_manager:
+        if not _docker_manager or not _proxy_client:
             raise HTTPException(status_code=503, detail="服务未就绪")
         
         # 获取容器内部 URL
@@ -337,41 +382,12 @@ def _register_routes(app: FastAPI) -> None:
         # 记录请求
         _docker_manager.record_request(server_name)
         
-        # 构建目标 URL
-        # 如果 path 为空（带尾斜杠的情况），转发到 /mcp
-        if not path or path == "":
-            target_url = f"{internal_url}/mcp"
-        else:
-            target_url = f"{internal_url}/{path}"
-        
-        # 代理请求
-        proxy_client = get_proxy_client()
-        return await proxy_client.proxy_request(request, target_url)
-    
-    # 处理 /mcp/{server_name} 没有尾随路径的情况
-    @app.api_route(
-        "/mcp/{server_name}",
-        methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
-    )
-    async def proxy_mcp_root(server_name: str, request: Request):
-        """代理 MCP 根请求"""
-        if not _docker_manager:
-            raise HTTPException(status_code=503, detail="服务未就绪")
-        
-        internal_url = _docker_manager.get_container_internal_url(server_name)
-        if not internal_url:
-            raise HTTPException(
-                status_code=404,
-                detail=f"容器 '{server_name}' 不存在"
-            )
-        
-        _docker_manager.record_request(server_name)
-        
-        # MCP 端点通常是 /mcp
-        target_url = f"{internal_url}/mcp"
+        # 没有子路径（或仅尾斜杠）时转发到 MCP 端点 /mcp
+        # 从 path_params 读取，避免根路由把 ?path= 查询参数当作子路径
+        path = request.path_params.get("path", "")
+        target_url = f"{internal_url}/{path}" if path else f"{internal_url}/mcp"
         
-        proxy_client = get_proxy_client()
-        return await proxy_client.proxy_request(request, target_url)
+        return await _proxy_client.proxy_request(request, target_url)
     
     # WebSocket 代理
     @app.websocket("/mcp/{server_name}/ws")
@@ -3,12 +3,20 @@
 import json
 import logging
 import os
+import time
 from dataclasses import asdict
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+try:
+    from yaml import CSafeDumper as YamlDumper
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # 未编译 libyaml 时回退到纯 Python 实现
+    from yaml import SafeDumper as YamlDumper
+    from yaml import SafeLoader as YamlLoader
+
 from .models import ContainerConfig, ContainerStats
 
 logger = logging.getLogger(__name__)
@@ -44,6 +52,10 @@ class ConfigManager:
         self._containers: dict[str, ContainerConfig] = {}
         self._stats: dict[str, ContainerStats] = {}
         
+        # 脏标记：变更先记录在内存，由 flush() 统一落盘
+        self._containers_dirty = False
+        self._stats_dirty = False
+        
         # 加载配置
         self._load_containers()
         self._load_stats()
@@ -57,7 +69,7 @@ class ConfigManager:
         
         try:
             with open(self.containers_file, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f) or {}
+                data = yaml.load(f, Loader=YamlLoader) or {}
             
             containers = data.get('containers', {})
             for name, config in containers.items():
@@ -68,6 +80,7 @@ class ConfigManager:
                     host_port=config.get('host_port'),
                     env=config.get('env', {}),
                     restart_policy=config.get('restart_policy', 'always'),
+                    pull_policy=config.get('pull_policy', 'missing'),
                     labels=config.get('labels', {}),
                     memory_limit=config.get('memory_limit'),
                     cpu_limit=config.get('cpu_limit'),
@@ -82,13 +95,15 @@ class ConfigManager:
         """保存容器配置到文件"""
         try:
             containers = {}
-            for name, config in self._containers.items():
+            # 先取快照，flush 可能在工作线程中执行
+            for name, config in list(self._containers.items()):
                 containers[name] = {
                     'image': config.image,
                     'internal_port': config.internal_port,
                     'host_port': config.host_port,
                     'env': config.env,
                     'restart_policy': config.restart_policy,
+                    'pull_policy': config.pull_policy,
                     'labels': config.labels,
                     'memory_limit': config.memory_limit,
                     'cpu_limit': config.cpu_limit,
@@ -100,7 +115,7 @@ class ConfigManager:
             # 原子写入
             temp_file = self.containers_file.with_suffix('.tmp')
             with open(temp_file, 'w', encoding='utf-8') as f:
-                yaml.dump(data, f, allow_unicode=True, default_flow_style=False)
+                yaml.dump(data, f, Dumper=YamlDumper, allow_unicode=True, default_flow_style=False)
             temp_file.replace(self.containers_file)
             
             logger.debug("容器配置已保存: %d 个", len(containers))
@@ -130,7 +145,7 @@ class ConfigManager:
         """保存统计数据到文件"""
         try:
             data = {}
-            for name, stats in self._stats.items():
+            for name, stats in list(self._stats.items()):
                 data[name] = {
                     'total_requests': stats.total_requests,
                 }
@@ -156,7 +171,7 @@ class ConfigManager:
         self._containers[config.name] = config
         if config.name not in self._stats:
             self._stats[config.name] = ContainerStats(name=config.name)
-        self._save_containers()
+        self._containers_dirty = True
         logger.info("已添加容器配置: %s", config.name)
     
     def remove_container(self, name: str) -> bool:
@@ -165,8 +180,8 @@ class ConfigManager:
             del self._containers[name]
             if name in self._stats:
                 del self._stats[name]
-            self._save_containers()
-            self._save_stats()
+            self._containers_dirty = True
+            self._stats_dirty = True
             logger.info("已删除容器配置: %s", name)
             return True
         return False
@@ -179,15 +194,32 @@ class ConfigManager:
     
     def increment_requests(self, name: str) -> None:
         """增加请求计数"""
-        from datetime import datetime
         stats = self.get_stats(name)
         stats.total_requests += 1
-        stats.last_access_time = datetime.now()
-        # 定期保存（每100次请求）
-        if stats.total_requests % 100 == 0:
+        stats.last_access_time = time.monotonic()
+        # 仅标记变更，由后台任务落盘
+        self._stats_dirty = True
+    
+    def mark_dirty(self) -> None:
+        """标记容器配置已在内存中修改，等待下次 flush() 写入"""
+        self._containers_dirty = True
+    
+    def flush(self, include_stats: bool = True) -> None:
+        """将有变更的数据写入文件
+        
+        Args:
+            include_stats: 是否同时写入统计数据（统计落盘间隔比容器配置长）
+        """
+        if self._containers_dirty:
+            self._containers_dirty = False
+            self._save_containers()
+        if include_stats and self._stats_dirty:
+            self._stats_dirty = False
             self._save_stats()
     
     def save_all(self) -> None:
         """保存所有数据"""
+        self._containers_dirty = False
+        self._stats_dirty = False
         self._save_containers()
         self._save_stats()
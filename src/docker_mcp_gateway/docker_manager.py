@@ -1,13 +1,19 @@
 """Docker 容器管理模块"""
 
 import asyncio
+import errno
+import functools
 import logging
+import random
 import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable
 
 import docker
-from docker.errors import APIError, ContainerError, ImageNotFound, NotFound
+from docker.errors import APIError, ContainerError, ImageNotFound, InvalidVersion, NotFound
 from docker.models.containers import Container
 
 from .config import ConfigManager
@@ -20,14 +26,58 @@ logger = logging.getLogger(__name__)
 GATEWAY_LABEL = "docker-mcp-gateway.managed"
 GATEWAY_NAME_LABEL = "docker-mcp-gateway.name"
 
+# 所有网关容器共享的基础标签
+_BASE_LABELS = {GATEWAY_LABEL: "true"}
+
 # 自动端口分配范围
 AUTO_PORT_START = 18100
 AUTO_PORT_END = 18999
 
+# Docker API 调用专用线程池大小
+DOCKER_MAX_WORKERS = 16
+
+# 并发查询单个容器信息时的最大并发数
+DOCKER_FANOUT_LIMIT = 10
+
+# 健康检查基础间隔与随机抖动（秒）
+HEALTH_CHECK_INTERVAL = 30.0
+HEALTH_CHECK_JITTER = 3.0
+
+# 状态在该时间内被生命周期操作更新过的容器，健康检查时跳过（秒）
+HEALTH_SKIP_RECENT = 5.0
+
+# 生命周期操作唤醒健康检查后，等待容器状态稳定的时间（秒）
+HEALTH_WAKE_DELAY = 2.0
+
+# 容器 inspect 信息缓存有效期（秒）
+ATTRS_CACHE_TTL = 2.0
+
+# 容器资源统计缓存有效期（秒）
+STATS_CACHE_TTL = 2.0
+
+# 容器列表索引有效期（秒）
+CONTAINER_INDEX_TTL = 1.0
+
+
+def _network_settings(attrs: dict) -> tuple[dict, dict]:
+    """一次性取出容器 attrs 中 NetworkSettings 的 (Ports, Networks)
+    
+    inspect 格式下 Ports 为字典；sparse 列表格式下 NetworkSettings 中没有 Ports，返回空字典。
+    """
+    ns = attrs.get('NetworkSettings') or {}
+    return ns.get('Ports') or {}, ns.get('Networks') or {}
+
+
+def _new_probe_socket() -> socket.socket:
+    """创建用于 bind 探测的套接字（SO_REUSEADDR 避免 TIME_WAIT 误判为占用）"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    return s
+
 
 def is_port_available(port: int, host: str = "0.0.0.0") -> bool:
     """检查端口是否可用"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+    with _new_probe_socket() as s:
         try:
             s.bind((host, port))
             return True
@@ -35,20 +85,55 @@ def is_port_available(port: int, host: str = "0.0.0.0") -> bool:
             return False
 
 
-def find_available_port(start: int = AUTO_PORT_START, end: int = AUTO_PORT_END) -> int | None:
-    """查找可用端口
+def first_bindable_port(ports, host: str = "0.0.0.0") -> int | None:
+    """按顺序探测端口，返回第一个可以 bind 的端口
+    
+    bind 失败（EADDRINUSE）后套接字仍处于未绑定状态，可直接复用于下一个端口，
+    只有遇到其他错误时才重建套接字，避免每个端口一次 socket/close。
     
     Args:
-        start: 起始端口
-        end: 结束端口
+        ports: 待探测的端口序列
+        host: 绑定地址
         
     Returns:
-        可用端口号，如果没有找到返回 None
+        第一个可用端口，如果都不可用返回 None
     """
-    for port in range(start, end + 1):
-        if is_port_available(port):
-            return port
-    return None
+    s = _new_probe_socket()
+    try:
+        for port in ports:
+            try:
+                s.bind((host, port))
+                return port
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    s.close()
+                    s = _new_probe_socket()
+        return None
+    finally:
+        s.close()
+
+
+def listening_ports() -> set[int] | None:
+    """一次性获取本机所有处于 LISTEN 状态的 TCP 端口
+    
+    Linux 下读取 /proc/net/tcp[6]；其他平台返回 None，由调用方逐个探测。
+    """
+    if sys.platform != "linux":
+        return None
+    
+    ports = set()
+    for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(path, encoding="ascii") as f:
+                next(f, None)  # 跳过表头
+                for line in f:
+                    fields = line.split()
+                    # fields: sl local_address rem_address st ...
+                    if len(fields) > 3 and fields[3] == "0A":
+                        ports.add(int(fields[1].rsplit(":", 1)[-1], 16))
+        except OSError:
+            pass
+    return ports
 
 
 class DockerManager:
@@ -59,27 +144,68 @@ class DockerManager:
         self._client: docker.DockerClient | None = None
         self._network_name = "mcp-gateway-network"
         
+        # docker-py 为同步 API，使用独立线程池执行，避免与默认线程池中的其他任务互相阻塞
+        self._executor = ThreadPoolExecutor(
+            max_workers=DOCKER_MAX_WORKERS,
+            thread_name_prefix="docker-api",
+        )
+        
         # 容器信息缓存
         self._container_info: dict[str, ContainerInfo] = {}
         
+        # 容器 inspect 信息短时缓存: name -> (monotonic 时间戳, attrs)
+        self._attrs_cache: dict[str, tuple[float, dict[str, Any]]] = {}
+        # 容器列表索引: name -> sparse Container，按名称查找时不再逐个 inspect
+        self._container_index: dict[str, Container] = {}
+        self._container_index_ts = 0.0
+        self._container_index_lock = asyncio.Lock()
+        # 索引中所有容器占用的主机端口快照，随索引一同刷新
+        self._index_ports: set[int] = set()
+        
         # 健康检查任务
         self._health_check_task: asyncio.Task | None = None
-        self._health_check_interval = 30  # 秒
+        self._health_check_interval = HEALTH_CHECK_INTERVAL
+        # 生命周期操作后唤醒健康检查，多次唤醒合并为一次检查
+        self._health_wake = asyncio.Event()
+        # 等待唤醒检查的容器名称
+        self._health_pending: set[str] = set()
+        
+        # 配置落盘任务
+        self._flush_task: asyncio.Task | None = None
+        self._flush_interval = 1  # 秒，容器配置
+        self._stats_flush_interval = 10  # 秒，统计数据变化频繁，单独使用更长的间隔
+        
+        # 资源统计缓存（后台刷新，避免请求路径上逐个调用 Docker stats）
+        self._stats_cache: dict[str, tuple[float, dict[str, Any]]] = {}
+        # 上一次 CPU 采样，用于计算 one-shot 模式下的 CPU 使用率
+        self._stats_samples: dict[str, dict[str, Any]] = {}
+        self._stats_task: asyncio.Task | None = None
+        self._stats_refresh_interval = 2  # 秒
+        # Docker Engine API < 1.41 不支持 one-shot 统计，首次失败后回退到普通模式
+        self._stats_one_shot = True
     
     @property
     def client(self) -> docker.DockerClient:
         """获取 Docker 客户端（延迟初始化）"""
         if self._client is None:
-            self._client = docker.from_env()
+            # 连接池与线程池大小一致，并发调用时复用连接而不是反复新建后丢弃
+            self._client = docker.from_env(max_pool_size=DOCKER_MAX_WORKERS)
         return self._client
     
+    async def _run_docker(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在 Docker 专用线程池中执行阻塞调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+    
     async def initialize(self) -> None:
         """初始化 Docker 管理器"""
         logger.info("初始化 Docker 管理器...")
         
         # 测试 Docker 连接
         try:
-            info = await asyncio.to_thread(self.client.ping)
+            info = await self._run_docker(self.client.ping)
             logger.info("Docker 连接成功")
         except Exception as e:
             logger.error("Docker 连接失败: %s", e)
@@ -94,17 +220,23 @@ class DockerManager:
         # 启动健康检查
         self._health_check_task = asyncio.create_task(self._health_check_loop())
         
+        # 启动配置落盘
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        
+        # 启动资源统计刷新
+        self._stats_task = asyncio.create_task(self._stats_refresh_loop())
+        
         logger.info("Docker 管理器初始化完成")
     
     async def _ensure_network(self) -> None:
         """确保 Gateway 网络存在"""
         try:
-            networks = await asyncio.to_thread(
+            networks = await self._run_docker(
                 self.client.networks.list,
                 names=[self._network_name]
             )
             if not networks:
-                await asyncio.to_thread(
+                await self._run_docker(
                     self.client.networks.create,
                     self._network_name,
                     driver="bridge"
@@ -119,9 +251,18 @@ class DockerManager:
         """同步配置文件中的容器状态"""
         configs = self.config.get_all_containers()
         
+        # 一次列出所有容器，避免逐个 inspect
+        try:
+            containers_by_name = await self._refresh_container_index(force=True)
+        except Exception as e:
+            logger.error("获取容器列表失败: %s", e)
+            containers_by_name = {}
+        
+        # 端口漂移的配置在内存中直接修改，最后统一标记一次待保存
+        updated_ports = []
         for name, config in configs.items():
             try:
-                container = await self._get_container(name)
+                container = containers_by_name.get(name)
                 host_port = config.host_port
                 
                 if container:
@@ -134,7 +275,7 @@ class DockerManager:
                         # 更新配置中的端口
                         if config.host_port != host_port:
                             config.host_port = host_port
-                            self.config.add_container(config)
+                            updated_ports.append(name)
                 else:
                     status = "not_created"
                     container_id = None
@@ -160,29 +301,95 @@ class DockerManager:
                 logger.debug("同步容器状态: %s -> %s (端口: %s)", name, status, host_port)
             except Exception as e:
                 logger.error("同步容器 %s 状态失败: %s", name, e)
+        
+        if updated_ports:
+            self.config.mark_dirty()
+            logger.info("已更新 %d 个容器的主机端口: %s", len(updated_ports), ", ".join(updated_ports))
+    
+    def _list_all_by_name(self) -> tuple[dict[str, Container], set[int]]:
+        """一次请求列出所有容器，按名称索引，并收集占用的主机端口
+        
+        使用 sparse 模式，只调用一次 /containers/json，不再逐个 inspect。
+        名称与端口在同一次遍历中提取，且在 Docker 线程池中完成，不占用事件循环。
+        注意 sparse 容器的 attrs 为列表格式（Names、Ports 列表、State 字符串）。
+        """
+        containers = self.client.containers.list(all=True, sparse=True)
+        by_name = {}
+        ports = set()
+        for container in containers:
+            attrs = container.attrs
+            for container_name in attrs.get('Names') or []:
+                by_name[container_name.lstrip('/')] = container
+            for binding in attrs.get('Ports') or []:
+                if binding.get('Type') == 'tcp' and binding.get('PublicPort'):
+                    ports.add(int(binding['PublicPort']))
+        return by_name, ports
+    
+    @staticmethod
+    def _iter_host_ports(container: Container) -> list[tuple[int, int]]:
+        """获取容器的 TCP 端口映射 (container_port, host_port)
+        
+        同时兼容 inspect 格式与 sparse 列表格式的 attrs。
+        """
+        attrs = container.attrs
+        result = []
+        ports, _networks = _network_settings(attrs)
+        if ports:
+            # inspect 格式: {"8081/tcp": [{"HostIp": ..., "HostPort": "18100"}]}
+            for port_key, bindings in ports.items():
+                port_str, _, proto = port_key.partition('/')
+                if proto != 'tcp' or not bindings:
+                    continue
+                for binding in bindings:
+                    if binding.get('HostPort'):
+                        result.append((int(port_str), int(binding['HostPort'])))
+        else:
+            # 列表格式: [{"PrivatePort": 8081, "PublicPort": 18100, "Type": "tcp"}]
+            for binding in attrs.get('Ports') or []:
+                if binding.get('Type') == 'tcp' and binding.get('PublicPort'):
+                    result.append((int(binding['PrivatePort']), int(binding['PublicPort'])))
+        return result
     
     def _get_host_port_from_container(self, container: Container, internal_port: int) -> int | None:
         """从容器获取主机端口"""
         try:
-            ports = container.attrs.get('NetworkSettings', {}).get('Ports', {})
-            port_key = f"{internal_port}/tcp"
-            bindings = ports.get(port_key, [])
-            if bindings and bindings[0]:
-                return int(bindings[0].get('HostPort', 0))
+            for container_port, host_port in self._iter_host_ports(container):
+                if container_port == internal_port:
+                    return host_port
         except Exception as e:
             logger.debug("获取容器端口失败: %s", e)
         return None
     
+    async def _refresh_container_index(self, force: bool = False) -> dict[str, Container]:
+        """刷新容器列表索引（过期时才重新请求 Docker）
+        
+        并发调用共享同一次刷新：等待锁期间已有其他调用完成刷新时直接复用结果。
+        force=True 时要求使用本次调用之后发起的列表请求。
+        """
+        requested = time.monotonic()
+        async with self._container_index_lock:
+            if force:
+                stale = self._container_index_ts < requested
+            else:
+                stale = time.monotonic() - self._container_index_ts > CONTAINER_INDEX_TTL
+            if stale:
+                # 时间戳取请求发起时刻，保证 force 调用看到的是之后的容器状态
+                started = time.monotonic()
+                index, ports = await self._run_docker(self._list_all_by_name)
+                self._container_index = index
+                self._index_ports = ports
+                self._container_index_ts = started
+        return self._container_index
+    
     async def _get_container(self, name: str) -> Container | None:
-        """获取容器对象"""
+        """获取容器对象
+        
+        返回容器列表索引中的 sparse 对象：status、id 及 start/stop/remove 等
+        操作可直接使用，attrs 为列表格式（无 Config 等 inspect 字段）。
+        """
         try:
-            container = await asyncio.to_thread(
-                self.client.containers.get,
-                name
-            )
-            return container
-        except NotFound:
-            return None
+            index = await self._refresh_container_index()
+            return index.get(name)
         except Exception as e:
             logger.error("获取容器 %s 失败: %s", name, e)
             return None
@@ -191,27 +398,115 @@ class DockerManager:
         """健康检查循环"""
         while True:
             try:
-                await asyncio.sleep(self._health_check_interval)
-                await self._check_all_containers_health()
+                timeout = self._health_check_interval + random.uniform(
+                    -HEALTH_CHECK_JITTER, HEALTH_CHECK_JITTER
+                )
+                try:
+                    await asyncio.wait_for(self._health_wake.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    await self._check_all_containers_health()
+                    continue
+                
+                # 生命周期操作唤醒：稍等容器稳定（同时合并连续操作），只检查发生变化的容器
+                await asyncio.sleep(HEALTH_WAKE_DELAY)
+                self._health_wake.clear()
+                names, self._health_pending = self._health_pending, set()
+                await self._check_all_containers_health(names)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error("健康检查异常: %s", e)
     
-    async def _check_all_containers_health(self) -> None:
-        """检查所有容器健康状态"""
-        for name in list(self._container_info.keys()):
+    async def _flush_loop(self) -> None:
+        """定期将配置变更写入文件"""
+        last_stats_flush = time.monotonic()
+        while True:
             try:
-                container = await self._get_container(name)
-                if container:
-                    info = self._container_info.get(name)
-                    if info:
-                        info.status = container.status
-                        # 检查健康状态
-                        health = container.attrs.get('State', {}).get('Health', {})
-                        info.health_status = health.get('Status', 'unknown')
+                await asyncio.sleep(self._flush_interval)
+                now = time.monotonic()
+                include_stats = now - last_stats_flush >= self._stats_flush_interval
+                if include_stats:
+                    last_stats_flush = now
+                await asyncio.to_thread(self.config.flush, include_stats)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("保存配置异常: %s", e)
+    
+    async def _stats_refresh_loop(self) -> None:
+        """资源统计刷新循环"""
+        while True:
+            try:
+                await self._refresh_all_stats()
+                await asyncio.sleep(self._stats_refresh_interval)
+            except asyncio.CancelledError:
+                break
             except Exception as e:
-                logger.debug("检查容器 %s 健康状态失败: %s", name, e)
+                logger.error("刷新资源统计异常: %s", e)
+    
+    async def _refresh_all_stats(self) -> None:
+        """并发刷新所有运行中容器的资源统计"""
+        names = [
+            name for name, info in self._container_info.items()
+            if info.status == "running"
+        ]
+        semaphore = asyncio.Semaphore(DOCKER_FANOUT_LIMIT)
+        
+        async def fetch(name: str) -> dict[str, Any]:
+            async with semaphore:
+                return await self.get_container_stats(name)
+        
+        await asyncio.gather(*(fetch(name) for name in names))
+        
+        # 清理已停止或已删除容器的统计
+        running = set(names)
+        for name in list(self._stats_cache):
+            if name not in running:
+                self._stats_cache.pop(name, None)
+                self._stats_samples.pop(name, None)
+    
+    @staticmethod
+    def _parse_health_from_status(status_text: str) -> str:
+        """从容器列表的 Status 文本中解析健康状态
+        
+        例如 "Up 5 minutes (healthy)"、"Up 3 seconds (health: starting)"。
+        """
+        if "(healthy)" in status_text:
+            return "healthy"
+        if "(unhealthy)" in status_text:
+            return "unhealthy"
+        if "(health: starting)" in status_text:
+            return "starting"
+        return "unknown"
+    
+    async def _check_all_containers_health(self, names: set[str] | None = None) -> None:
+        """检查容器健康状态（单次列表请求，不逐个 inspect）
+        
+        Args:
+            names: 只检查指定容器（生命周期操作唤醒时）；为 None 时检查全部容器，
+                并跳过刚由生命周期操作更新过状态的容器
+        """
+        try:
+            containers_by_name = await self._refresh_container_index(force=True)
+        except Exception as e:
+            logger.debug("获取容器列表失败: %s", e)
+            return
+        
+        now = time.monotonic()
+        for name in list(self._container_info if names is None else names):
+            info = self._container_info.get(name)
+            container = containers_by_name.get(name)
+            if not info or not container:
+                continue
+            # 定时检查时，刚由生命周期操作更新过状态的容器不再覆盖
+            if names is None and now - info.status_updated_at < HEALTH_SKIP_RECENT:
+                continue
+            if info.status != container.status:
+                self._invalidate_container_cache(name)
+            info.status = container.status
+            info.health_status = self._parse_health_from_status(
+                container.attrs.get('Status') or ''
+            )
     
     async def _import_existing_container(
         self,
@@ -231,13 +526,13 @@ class DockerManager:
         """
         # 将容器连接到 Gateway 网络（如果未连接）
         try:
-            networks = container.attrs.get('NetworkSettings', {}).get('Networks', {})
+            _ports, networks = _network_settings(container.attrs)
             if self._network_name not in networks:
-                network = await asyncio.to_thread(
+                network = await self._run_docker(
                     self.client.networks.get,
                     self._network_name
                 )
-                await asyncio.to_thread(network.connect, container)
+                await self._run_docker(network.connect, container)
                 logger.info("已将容器 '%s' 连接到 Gateway 网络", name)
         except Exception as e:
             logger.warning("连接容器到 Gateway 网络失败: %s", e)
@@ -247,32 +542,67 @@ class DockerManager:
         if host_port:
             config.host_port = host_port
         
-        # 保存配置
-        self.config.add_container(config)
+        info = self._finalize_container(name, config, container.id, container.status)
         
+        logger.info("容器 '%s' 已导入 Gateway 管理 (端口: %s)", name, config.host_port)
+        return info
+    
+    def _finalize_container(
+        self,
+        name: str,
+        config: ContainerConfig,
+        container_id: str,
+        status: str,
+    ) -> ContainerInfo:
+        """统一提交容器配置与缓存
+        
+        创建和导入流程中只在内存中修改 config，最后由这里一次性写入配置
+        并更新 _container_info，避免中途出现不一致状态。
+        
+        Args:
+            name: 容器名称
+            config: 容器配置（host_port 已确定）
+            container_id: 容器 ID
+            status: 容器状态
+            
+        Returns:
+            ContainerInfo: 容器信息
+        """
         # 更新缓存 - 使用主机端口访问
         if config.host_port:
             internal_url = f"http://localhost:{config.host_port}"
         else:
             internal_url = f"http://{name}:{config.internal_port}"
         
+        self.config.add_container(config)
         info = ContainerInfo(
             name=name,
             config=config,
-            status=container.status,
-            container_id=container.id,
+            status=status,
+            container_id=container_id,
             internal_url=internal_url,
             external_path=f"/mcp/{name}",
             stats=self.config.get_stats(name),
             host_port=config.host_port,
         )
         self._container_info[name] = info
-        
-        logger.info("容器 '%s' 已导入 Gateway 管理 (端口: %s)", name, config.host_port)
+        self._invalidate_container_cache(name)
+        self._set_status(name, status)
         return info
     
+    def _set_status(self, name: str, status: str) -> None:
+        """记录生命周期操作得到的容器状态，并唤醒健康检查"""
+        info = self._container_info[name]
+        info.status = status
+        info.status_updated_at = time.monotonic()
+        self._health_pending.add(name)
+        self._health_wake.set()
+    
     def _get_used_ports(self) -> set[int]:
-        """获取已使用的主机端口"""
+        """获取已使用的主机端口
+        
+        只读取内存中的状态（配置、容器信息与最近一次的容器列表索引），不访问 Docker。
+        """
         used_ports = set()
         
         # 从配置中获取
@@ -280,18 +610,13 @@ class DockerManager:
             if config.host_port:
                 used_ports.add(config.host_port)
         
-        # 从运行中的容器获取
-        try:
-            containers = self.client.containers.list(all=True)
-            for container in containers:
-                ports = container.attrs.get('NetworkSettings', {}).get('Ports', {})
-                for port_bindings in ports.values():
-                    if port_bindings:
-                        for binding in port_bindings:
-                            if binding.get('HostPort'):
-                                used_ports.add(int(binding['HostPort']))
-        except Exception as e:
-            logger.debug("获取容器端口列表失败: %s", e)
+        # 从已管理的容器信息中获取
+        for info in self._container_info.values():
+            if info.host_port:
+                used_ports.add(info.host_port)
+        
+        # 从容器列表索引获取（包含非本 Gateway 管理的容器）
+        used_ports |= self._index_ports
         
         return used_ports
     
@@ -305,20 +630,16 @@ class DockerManager:
         if name in self.config.get_all_containers():
             return True, f"容器名称 '{name}' 已存在于配置中"
         
-        # 检查 Docker 中是否已存在
-        try:
-            container = self.client.containers.get(name)
-            # 容器存在，检查是否由本 Gateway 管理
-            labels = container.labels or {}
-            if labels.get(GATEWAY_LABEL) == "true":
-                return False, None  # 由本 Gateway 管理，可以导入
-            else:
-                return True, f"容器名称 '{name}' 已被其他服务使用"
-        except NotFound:
-            return False, None
-        except Exception as e:
-            logger.warning("检查容器名称时出错: %s", e)
+        # 检查 Docker 中是否已存在（使用容器列表索引，调用前需已刷新）
+        container = self._container_index.get(name)
+        if container is None:
             return False, None
+        
+        # 容器存在，检查是否由本 Gateway 管理
+        labels = container.attrs.get('Labels') or {}
+        if labels.get(GATEWAY_LABEL) == "true":
+            return False, None  # 由本 Gateway 管理，可以导入
+        return True, f"容器名称 '{name}' 已被其他服务使用"
     
     def _check_port_conflict(self, host_port: int) -> tuple[bool, str | None]:
         """检查主机端口是否冲突
@@ -359,14 +680,24 @@ class DockerManager:
                 return preferred_port
             logger.warning("首选端口 %d 不可用，将自动分配", preferred_port)
         
-        # 获取已使用的端口
+        # 获取已使用的端口（Linux 下一次读取系统监听端口，无需逐个 bind 探测）
         used_ports = self._get_used_ports()
+        listening = listening_ports()
+        if listening is not None:
+            used_ports |= listening
         
         # 查找可用端口
-        for port in range(AUTO_PORT_START, AUTO_PORT_END + 1):
-            if port not in used_ports and is_port_available(port):
-                logger.info("自动分配端口: %d", port)
-                return port
+        candidates = (
+            port for port in range(AUTO_PORT_START, AUTO_PORT_END + 1)
+            if port not in used_ports
+        )
+        if listening is not None:
+            port = next(candidates, None)
+        else:
+            port = first_bindable_port(candidates)
+        if port is not None:
+            logger.info("自动分配端口: %d", port)
+            return port
         
         raise RuntimeError(f"无法分配端口，范围 {AUTO_PORT_START}-{AUTO_PORT_END} 内没有可用端口")
     
@@ -415,12 +746,35 @@ class DockerManager:
             host_port=host_port,
             env=parsed.env,
             restart_policy=parsed.restart_policy or "always",
+            pull_policy=parsed.pull or "missing",
             labels=parsed.labels,
             memory_limit=memory_limit,
             cpu_limit=cpu_limit,
             raw_command=command,
         )
     
+    async def _ensure_image(self, config: ContainerConfig) -> None:
+        """按拉取策略准备镜像
+        
+        - missing: 本地不存在时才拉取（默认）
+        - always: 总是拉取
+        - never: 只使用本地镜像
+        
+        Raises:
+            ImageNotFound: 策略为 never 且本地不存在
+        """
+        if config.pull_policy != "always":
+            try:
+                await self._run_docker(self.client.images.get, config.image)
+                logger.info("镜像已存在，跳过拉取: %s", config.image)
+                return
+            except ImageNotFound:
+                if config.pull_policy == "never":
+                    raise
+        
+        logger.info("拉取镜像: %s", config.image)
+        await self._run_docker(self.client.images.pull, config.image)
+    
     async def create_container(self, config: ContainerConfig, import_existing: bool = True) -> ContainerInfo:
         """创建并启动容器
         
@@ -442,13 +796,14 @@ class DockerManager:
         """
         name = config.name
         
+        # 检查 Docker 中是否已存在（同时刷新容器列表索引）
+        existing = await self._get_container(name)
+        
         # ===== 1. 重名检测 =====
         is_conflict, error_msg = self._check_name_conflict(name)
         if is_conflict and not import_existing:
             raise ValueError(error_msg)
         
-        # 检查 Docker 中是否已存在
-        existing = await self._get_container(name)
         if existing:
             if import_existing:
                 # 导入已存在的容器
@@ -479,9 +834,8 @@ class DockerManager:
                     name, config.image, config.host_port, config.internal_port)
         
         try:
-            # 拉取镜像
-            logger.info("拉取镜像: %s", config.image)
-            await asyncio.to_thread(self.client.images.pull, config.image)
+            # 拉取镜像（本地已存在时按拉取策略跳过）
+            await self._ensure_image(config)
             
             # 准备容器参数
             container_kwargs: dict[str, Any] = {
@@ -489,24 +843,12 @@ class DockerManager:
                 'name': name,
                 'detach': True,
                 'environment': config.env,
-                'labels': {
-                    GATEWAY_LABEL: "true",
-                    GATEWAY_NAME_LABEL: name,
-                    **config.labels,
-                },
+                'labels': {**_BASE_LABELS, GATEWAY_NAME_LABEL: name, **config.labels},
+                # 端口映射（必须）- Gateway 需要通过主机端口访问容器
+                # 没有指定主机端口时为 None，由 Docker 自动分配
+                'ports': {f'{config.internal_port}/tcp': config.host_port or None},
             }
             
-            # 端口映射（必须）- Gateway 需要通过主机端口访问容器
-            if config.host_port:
-                container_kwargs['ports'] = {
-                    f'{config.internal_port}/tcp': config.host_port
-                }
-            else:
-                # 如果没有指定主机端口，自动分配
-                container_kwargs['ports'] = {
-                    f'{config.internal_port}/tcp': None  # Docker 自动分配端口
-                }
-            
             # 重启策略
             if config.restart_policy:
                 container_kwargs['restart_policy'] = {
@@ -520,40 +862,22 @@ class DockerManager:
                 container_kwargs['nano_cpus'] = int(config.cpu_limit * 1e9)
             
             # 创建容器
-            container = await asyncio.to_thread(
+            container = await self._run_docker(
                 self.client.containers.run,
                 **container_kwargs
             )
             
             logger.info("容器创建成功: %s (ID: %s)", name, container.short_id)
             
-            # 获取实际分配的端口（Docker 自动分配时）
-            container.reload()  # 刷新容器信息
-            actual_port = self._get_host_port_from_container(container, config.internal_port)
-            if actual_port and actual_port != config.host_port:
-                logger.info("Docker 分配端口: %d -> %d", config.host_port or 0, actual_port)
-                config.host_port = actual_port
+            # 主机端口在创建前已分配并显式映射，无需再 inspect 容器
+            # 一次性提交配置和缓存
+            info = self._finalize_container(name, config, container.id, "running")
+            now = datetime.now()
+            info.stats.created_at = now
+            info.stats.started_at = now
+            await self._warm_internal_url(name)
             
-            # 保存配置
-            self.config.add_container(config)
-            
-            # 更新缓存 - 使用主机端口访问
-            internal_url = f"http://localhost:{config.host_port}"
-            info = ContainerInfo(
-                name=name,
-                config=config,
-                status="running",
-                container_id=container.id,
-                internal_url=internal_url,
-                external_path=f"/mcp/{name}",
-                stats=self.config.get_stats(name),
-                host_port=config.host_port,
-            )
-            info.stats.created_at = datetime.now()
-            info.stats.started_at = datetime.now()
-            self._container_info[name] = info
-            
-            logger.info("容器已上线: %s, 访问地址: /mcp/%s (内部: %s)", name, name, internal_url)
+            logger.info("容器已上线: %s, 访问地址: /mcp/%s (内部: %s)", name, name, info.internal_url)
             
             return info
             
@@ -583,7 +907,7 @@ class DockerManager:
             if container:
                 logger.info("找到 Docker 容器: %s (ID: %s, 状态: %s)", 
                            name, container.short_id, container.status)
-                await asyncio.to_thread(container.remove, force=force)
+                await self._run_docker(container.remove, force=force)
                 logger.info("Docker 容器已删除: %s", name)
             else:
                 logger.warning("Docker 中未找到容器: %s，将仅删除配置", name)
@@ -593,6 +917,7 @@ class DockerManager:
             logger.info("配置删除结果: %s -> %s", name, config_removed)
             
             # 3. 删除缓存
+            self._invalidate_container_cache(name)
             if name in self._container_info:
                 del self._container_info[name]
                 logger.info("已从缓存中删除: %s", name)
@@ -623,13 +948,15 @@ class DockerManager:
                     return False
             
             if container.status != "running":
-                await asyncio.to_thread(container.start)
+                await self._run_docker(container.start)
                 logger.info("容器已启动: %s", name)
             
             # 更新状态
+            self._invalidate_container_cache(name)
             if name in self._container_info:
-                self._container_info[name].status = "running"
+                self._set_status(name, "running")
                 self._container_info[name].stats.started_at = datetime.now()
+            await self._warm_internal_url(name)
             
             return True
             
@@ -644,12 +971,13 @@ class DockerManager:
         try:
             container = await self._get_container(name)
             if container and container.status == "running":
-                await asyncio.to_thread(container.stop, timeout=timeout)
+                await self._run_docker(container.stop, timeout=timeout)
                 logger.info("容器已停止: %s", name)
             
             # 更新状态
+            self._invalidate_container_cache(name)
             if name in self._container_info:
-                self._container_info[name].status = "exited"
+                self._set_status(name, "exited")
             
             return True
             
@@ -664,13 +992,15 @@ class DockerManager:
         try:
             container = await self._get_container(name)
             if container:
-                await asyncio.to_thread(container.restart, timeout=timeout)
+                await self._run_docker(container.restart, timeout=timeout)
                 logger.info("容器已重启: %s", name)
                 
                 # 更新状态
+                self._invalidate_container_cache(name)
                 if name in self._container_info:
-                    self._container_info[name].status = "running"
+                    self._set_status(name, "running")
                     self._container_info[name].stats.started_at = datetime.now()
+                await self._warm_internal_url(name)
                 
                 return True
             return False
@@ -707,7 +1037,7 @@ class DockerManager:
             if since:
                 kwargs['since'] = since
             
-            logs = await asyncio.to_thread(
+            logs = await self._run_docker(
                 container.logs,
                 **kwargs
             )
@@ -720,17 +1050,40 @@ class DockerManager:
             logger.error("获取容器 %s 日志失败: %s", name, e)
             return f"获取日志失败: {e}"
     
+    async def _read_stats(self, container_id: str) -> dict[str, Any]:
+        """按容器 ID 读取一次统计，daemon 不支持 one-shot 时回退到普通模式"""
+        if self._stats_one_shot:
+            try:
+                return await self._run_docker(
+                    self.client.api.stats, container_id, stream=False, one_shot=True
+                )
+            except InvalidVersion:
+                logger.info("Docker Engine API 版本低于 1.41，不支持 one-shot 统计，回退到普通模式")
+                self._stats_one_shot = False
+        return await self._run_docker(self.client.api.stats, container_id, stream=False)
+    
     async def get_container_stats(self, name: str) -> dict[str, Any]:
-        """获取容器资源使用统计"""
+        """获取容器资源使用统计
+        
+        使用 one-shot 模式读取（跳过 Docker 内部约 1 秒的双次采样），
+        CPU 使用率根据与上一次采样的差值计算；结果缓存 STATS_CACHE_TTL 秒。
+        """
+        now = time.monotonic()
+        cached = self._stats_cache.get(name)
+        if cached and now - cached[0] < STATS_CACHE_TTL:
+            return cached[1]
+        
         try:
-            container = await self._get_container(name)
-            if not container:
-                return {}
+            # 已知容器 ID 时直接读取统计，不依赖容器列表索引
+            info = self._container_info.get(name)
+            container_id = info.container_id if info else None
+            if not container_id:
+                container = await self._get_container(name)
+                if not container:
+                    return {}
+                container_id = container.id
             
-            stats = await asyncio.to_thread(
-                container.stats,
-                stream=False
-            )
+            stats = await self._read_stats(container_id)
             
             # 解析内存使用
             memory_stats = stats.get('memory_stats', {})
@@ -739,9 +1092,10 @@ class DockerManager:
             memory_mb = memory_usage / (1024 * 1024)
             memory_percent = (memory_usage / memory_limit) * 100 if memory_limit else 0
             
-            # 解析 CPU 使用
+            # 解析 CPU 使用（one-shot 不含 precpu_stats，使用上一次采样）
             cpu_stats = stats.get('cpu_stats', {})
-            precpu_stats = stats.get('precpu_stats', {})
+            precpu_stats = self._stats_samples.get(name) or stats.get('precpu_stats', {})
+            self._stats_samples[name] = cpu_stats
             cpu_percent = 0.0
             
             cpu_delta = (
@@ -753,20 +1107,27 @@ class DockerManager:
                 precpu_stats.get('system_cpu_usage', 0)
             )
             
-            if system_delta > 0:
+            if system_delta > 0 and precpu_stats.get('system_cpu_usage'):
                 cpu_count = cpu_stats.get('online_cpus', 1)
                 cpu_percent = (cpu_delta / system_delta) * cpu_count * 100
             
-            return {
+            result = {
                 'memory_mb': round(memory_mb, 2),
                 'memory_percent': round(memory_percent, 2),
                 'cpu_percent': round(cpu_percent, 2),
             }
+            self._stats_cache[name] = (time.monotonic(), result)
+            return result
             
         except Exception as e:
             logger.debug("获取容器 %s 统计信息失败: %s", name, e)
             return {}
     
+    def get_cached_stats(self, name: str) -> dict[str, Any]:
+        """获取缓存的容器资源统计（由后台任务刷新）"""
+        cached = self._stats_cache.get(name)
+        return cached[1] if cached else {}
+    
     def get_container_info(self, name: str) -> ContainerInfo | None:
         """获取容器信息"""
         return self._container_info.get(name)
@@ -775,12 +1136,59 @@ class DockerManager:
         """获取所有容器信息"""
         return list(self._container_info.values())
     
+    def _invalidate_container_cache(self, name: str) -> None:
+        """使容器访问 URL 与 inspect 信息缓存失效"""
+        info = self._container_info.get(name)
+        if info:
+            info.resolved_url = None
+        self._attrs_cache.pop(name, None)
+        self._container_index_ts = 0.0
+    
+    def _get_attrs_cached(self, name: str, ttl: float = ATTRS_CACHE_TTL) -> dict[str, Any] | None:
+        """获取容器 inspect 信息（带短时缓存）
+        
+        Returns:
+            容器 attrs，容器不存在时返回 None
+        """
+        now = time.monotonic()
+        cached = self._attrs_cache.get(name)
+        if cached and now - cached[0] < ttl:
+            return cached[1]
+        
+        try:
+            container = self.client.containers.get(name)
+        except NotFound:
+            self._attrs_cache.pop(name, None)
+            return None
+        
+        attrs = container.attrs
+        self._attrs_cache[name] = (now, attrs)
+        return attrs
+    
+    async def _warm_internal_url(self, name: str) -> None:
+        """容器创建/启动后预先解析访问 URL，避免首个代理请求承担 inspect 开销"""
+        info = self._container_info.get(name)
+        if info and (info.resolved_url or info.host_port):
+            # 已知主机端口时不访问 Docker，直接在事件循环中解析
+            self.get_container_internal_url(name)
+            return
+        await self._run_docker(self.get_container_internal_url, name)
+    
     def get_container_internal_url(self, name: str) -> str | None:
         """获取容器访问 URL
         
-        优先使用端口映射（localhost:host_port），如果没有端口映射则使用容器 IP。
+        优先使用已知的主机端口映射（127.0.0.1:host_port），未知时才 inspect 容器，
+        没有端口映射则使用容器 IP。结果会被缓存，直到容器生命周期发生变化。
         """
         info = self._container_info.get(name)
+        if info and info.resolved_url:
+            return info.resolved_url
+        
+        # 已知主机端口时直接使用，无需 inspect
+        if info and info.host_port:
+            info.resolved_url = f"http://127.0.0.1:{info.host_port}"
+            return info.resolved_url
+        
         config = info.config if info else self.config.get_container(name)
         
         if not config:
@@ -788,28 +1196,36 @@ class DockerManager:
         
         # 优先使用端口映射（Gateway 运行在主机上）
         try:
-            container = self.client.containers.get(name)
-            ports = container.attrs.get('NetworkSettings', {}).get('Ports', {})
+            attrs = self._get_attrs_cached(name) or {}
+            ports, networks = _network_settings(attrs)
             
             # 查找容器内部端口的映射
             port_key = f"{config.internal_port}/tcp"
             if port_key in ports and ports[port_key]:
                 host_port = ports[port_key][0].get('HostPort')
                 if host_port:
-                    return f"http://127.0.0.1:{host_port}"
+                    url = f"http://127.0.0.1:{host_port}"
+                    if info:
+                        info.resolved_url = url
+                    return url
             
             # 如果没有端口映射，使用容器 IP
-            networks = container.attrs.get('NetworkSettings', {}).get('Networks', {})
             # 优先使用 gateway 网络的 IP
             if self._network_name in networks:
                 ip = networks[self._network_name].get('IPAddress')
                 if ip:
-                    return f"http://{ip}:{config.internal_port}"
+                    url = f"http://{ip}:{config.internal_port}"
+                    if info:
+                        info.resolved_url = url
+                    return url
             # 使用任意网络的 IP
             for network in networks.values():
                 ip = network.get('IPAddress')
                 if ip:
-                    return f"http://{ip}:{config.internal_port}"
+                    url = f"http://{ip}:{config.internal_port}"
+                    if info:
+                        info.resolved_url = url
+                    return url
         except Exception as e:
             logger.debug("获取容器 %s URL 失败: %s", name, e)
         
@@ -824,25 +1240,27 @@ class DockerManager:
         self.config.increment_requests(name)
         if name in self._container_info:
             self._container_info[name].stats.total_requests += 1
-            self._container_info[name].stats.last_access_time = datetime.now()
+            self._container_info[name].stats.last_access_time = time.monotonic()
     
     async def cleanup(self) -> None:
         """清理资源"""
         logger.info("清理 Docker 管理器...")
         
-        # 停止健康检查
-        if self._health_check_task:
-            self._health_check_task.cancel()
-            try:
-                await self._health_check_task
-            except asyncio.CancelledError:
-                pass
+        # 停止后台任务
+        for task in (self._health_check_task, self._flush_task, self._stats_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         
         # 保存配置
-        self.config.save_all()
+        await asyncio.to_thread(self.config.save_all)
         
         # 关闭 Docker 客户端
         if self._client:
             self._client.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
         
         logger.info("Docker 管理器清理完成")
@@ -3,12 +3,11 @@
 解析 docker run 命令字符串，提取容器配置信息。
 """
 
-import re
-import shlex
 from dataclasses import dataclass, field
+from typing import Callable
 
 
-@dataclass
+@dataclass(slots=True)
 class ParsedDockerRun:
     """解析后的 docker run 命令"""
     image: str = ""
@@ -17,6 +16,7 @@ class ParsedDockerRun:
     env: dict[str, str] = field(default_factory=dict)
     volumes: list[str] = field(default_factory=list)
     restart_policy: str | None = None
+    pull: str | None = None
     detach: bool = False
     interactive: bool = False
     tty: bool = False
@@ -28,6 +28,90 @@ class ParsedDockerRun:
     raw_command: str = ""
 
 
+def _set_detach(result: ParsedDockerRun, value: str | None) -> None:
+    result.detach = True
+
+
+def _set_interactive(result: ParsedDockerRun, value: str | None) -> None:
+    result.interactive = True
+
+
+def _set_tty(result: ParsedDockerRun, value: str | None) -> None:
+    result.tty = True
+
+
+def _set_name(result: ParsedDockerRun, value: str) -> None:
+    result.name = value
+
+
+def _add_port(result: ParsedDockerRun, value: str) -> None:
+    parsed_port = _parse_port_mapping(value)
+    if parsed_port:
+        result.ports.append(parsed_port)
+
+
+def _add_env(result: ParsedDockerRun, value: str) -> None:
+    key, val = _parse_env(value)
+    if key:
+        result.env[key] = val
+
+
+def _add_volume(result: ParsedDockerRun, value: str) -> None:
+    result.volumes.append(value)
+
+
+def _set_restart(result: ParsedDockerRun, value: str) -> None:
+    result.restart_policy = value
+
+
+def _set_pull(result: ParsedDockerRun, value: str) -> None:
+    result.pull = value
+
+
+def _set_network(result: ParsedDockerRun, value: str) -> None:
+    result.network = value
+
+
+def _add_label(result: ParsedDockerRun, value: str) -> None:
+    key, val = _parse_env(value)  # 格式与环境变量相同
+    if key:
+        result.labels[key] = val
+
+
+def _set_memory(result: ParsedDockerRun, value: str) -> None:
+    result.memory = value
+
+
+def _set_cpus(result: ParsedDockerRun, value: str) -> None:
+    result.cpus = value
+
+
+# 参数表: 参数名 -> (需要的值个数, 处理函数)
+_FLAG_TABLE: dict[str, tuple[int, Callable[[ParsedDockerRun, str | None], None]]] = {
+    '-d': (0, _set_detach),
+    '--detach': (0, _set_detach),
+    '-i': (0, _set_interactive),
+    '--interactive': (0, _set_interactive),
+    '-t': (0, _set_tty),
+    '--tty': (0, _set_tty),
+    '--name': (1, _set_name),
+    '-p': (1, _add_port),
+    '--publish': (1, _add_port),
+    '-e': (1, _add_env),
+    '--env': (1, _add_env),
+    '-v': (1, _add_volume),
+    '--volume': (1, _add_volume),
+    '--restart': (1, _set_restart),
+    '--pull': (1, _set_pull),
+    '--network': (1, _set_network),
+    '-l': (1, _add_label),
+    '--label': (1, _add_label),
+    '-m': (1, _set_memory),
+    '--memory': (1, _set_memory),
+    '--cpus': (1, _set_cpus),
+}
+
+
 def parse_docker_run(command: str) -> ParsedDockerRun:
     """解析 docker run 命令字符串
     
@@ -37,6 +121,7 @@ def parse_docker_run(command: str) -> ParsedDockerRun:
     - -e/--env: 环境变量
     - -v/--volume: 卷挂载
     - --restart: 重启策略
+    - --pull: 镜像拉取策略
     - -d/--detach: 后台运行
     - -i/--interactive: 交互模式
     - -t/--tty: 分配终端
@@ -60,11 +145,14 @@ def parse_docker_run(command: str) -> ParsedDockerRun:
     cleaned = command.replace('\\\n', ' ').replace('\\', ' ')
     cleaned = ' '.join(cleaned.split())
     
-    # 使用 shlex 分割参数（处理引号）
-    try:
-        tokens = shlex.split(cleaned)
-    except ValueError as e:
-        raise ValueError(f"命令解析错误: {e}")
+    # 没有引号时直接按空白分割；有引号时逐字符分割参数（处理引号）
+    if '"' not in cleaned and "'" not in cleaned:
+        tokens = cleaned.split()
+    else:
+        try:
+            tokens = _tokenize(cleaned)
+        except ValueError as e:
+            raise ValueError(f"命令解析错误: {e}")
     
     if not tokens:
         raise ValueError("空命令")
@@ -87,181 +175,37 @@ def parse_docker_run(command: str) -> ParsedDockerRun:
             result.extra_args = tokens[i:]
             break
         
-        # -d, --detach
-        if token in ('-d', '--detach'):
-            result.detach = True
-            i += 1
-            continue
-        
-        # -i, --interactive
-        if token in ('-i', '--interactive'):
-            result.interactive = True
-            i += 1
-            continue
-        
-        # -t, --tty
-        if token in ('-t', '--tty'):
-            result.tty = True
-            i += 1
-            continue
-        
-        # -dit 组合
-        if token.startswith('-') and not token.startswith('--') and len(token) > 2:
-            flags = token[1:]
-            for f in flags:
-                if f == 'd':
-                    result.detach = True
-                elif f == 'i':
-                    result.interactive = True
-                elif f == 't':
-                    result.tty = True
-            i += 1
-            continue
-        
-        # --name
-        if token == '--name':
-            if i + 1 < len(tokens):
-                result.name = tokens[i + 1]
-                i += 2
-            else:
-                i += 1
-            continue
-        
-        if token.startswith('--name='):
-            result.name = token.split('=', 1)[1]
-            i += 1
-            continue
-        
-        # -p, --publish (端口映射)
-        if token in ('-p', '--publish'):
-            if i + 1 < len(tokens):
-                port_mapping = tokens[i + 1]
-                parsed_port = _parse_port_mapping(port_mapping)
-                if parsed_port:
-                    result.ports.append(parsed_port)
-                i += 2
-            else:
-                i += 1
-            continue
-        
-        if token.startswith('-p=') or token.startswith('--publish='):
-            port_mapping = token.split('=', 1)[1]
-            parsed_port = _parse_port_mapping(port_mapping)
-            if parsed_port:
-                result.ports.append(parsed_port)
-            i += 1
-            continue
-        
-        # -e, --env (环境变量)
-        if token in ('-e', '--env'):
-            if i + 1 < len(tokens):
-                env_str = tokens[i + 1]
-                key, value = _parse_env(env_str)
-                if key:
-                    result.env[key] = value
-                i += 2
-            else:
-                i += 1
-            continue
-        
-        if token.startswith('-e=') or token.startswith('--env='):
-            env_str = token.split('=', 1)[1]
-            key, value = _parse_env(env_str)
-            if key:
-                result.env[key] = value
+        # -dit 组合（单横线、多个字母且不带 =）
+        if not token.startswith('--') and len(token) > 2 and '=' not in token:
+            for f in token[1:]:
+                entry = _FLAG_TABLE.get('-' + f)
+                if entry and entry[0] == 0:
+                    entry[1](result, None)
             i += 1
             continue
         
-        # -v, --volume (卷挂载)
-        if token in ('-v', '--volume'):
-            if i + 1 < len(tokens):
-                result.volumes.append(tokens[i + 1])
-                i += 2
-            else:
-                i += 1
-            continue
-        
-        if token.startswith('-v=') or token.startswith('--volume='):
-            result.volumes.append(token.split('=', 1)[1])
-            i += 1
-            continue
+        # 按参数表分发：--flag=value 或 --flag value
+        if '=' in token:
+            flag, _, value = token.partition('=')
+        else:
+            flag, value = token, None
         
-        # --restart
-        if token == '--restart':
-            if i + 1 < len(tokens):
-                result.restart_policy = tokens[i + 1]
-                i += 2
-            else:
+        entry = _FLAG_TABLE.get(flag)
+        if entry:
+            arity, setter = entry
+            if arity == 0:
+                setter(result, value)
                 i += 1
-            continue
-        
-        if token.startswith('--restart='):
-            result.restart_policy = token.split('=', 1)[1]
-            i += 1
-            continue
-        
-        # --network
-        if token == '--network':
-            if i + 1 < len(tokens):
-                result.network = tokens[i + 1]
-                i += 2
-            else:
+            elif value is not None:
+                setter(result, value)
                 i += 1
-            continue
-        
-        if token.startswith('--network='):
-            result.network = token.split('=', 1)[1]
-            i += 1
-            continue
-        
-        # -l, --label
-        if token in ('-l', '--label'):
-            if i + 1 < len(tokens):
-                label_str = tokens[i + 1]
-                key, value = _parse_env(label_str)  # 格式相同
-                if key:
-                    result.labels[key] = value
+            elif i + 1 < len(tokens):
+                setter(result, tokens[i + 1])
                 i += 2
             else:
                 i += 1
             continue
         
-        if token.startswith('-l=') or token.startswith('--label='):
-            label_str = token.split('=', 1)[1]
-            key, value = _parse_env(label_str)
-            if key:
-                result.labels[key] = value
-            i += 1
-            continue
-        
-        # --memory, -m
-        if token in ('-m', '--memory'):
-            if i + 1 < len(tokens):
-                result.memory = tokens[i + 1]
-                i += 2
-            else:
-                i += 1
-            continue
-        
-        if token.startswith('-m=') or token.startswith('--memory='):
-            result.memory = token.split('=', 1)[1]
-            i += 1
-            continue
-        
-        # --cpus
-        if token == '--cpus':
-            if i + 1 < len(tokens):
-                result.cpus = tokens[i + 1]
-                i += 2
-            else:
-                i += 1
-            continue
-        
-        if token.startswith('--cpus='):
-            result.cpus = token.split('=', 1)[1]
-            i += 1
-            continue
-        
         # 跳过未知参数
         i += 1
     
@@ -272,6 +216,43 @@ def parse_docker_run(command: str) -> ParsedDockerRun:
     return result
 
 
+def _tokenize(command: str) -> list[str]:
+    """按空白分割命令，支持单引号/双引号包裹的参数
+    
+    反斜杠在清理阶段已替换为空格，因此只需处理引号，单次遍历即可完成。
+    
+    Raises:
+        ValueError: 引号未闭合
+    """
+    tokens = []
+    buf: list[str] = []
+    in_token = False
+    quote = None
+    for ch in command:
+        if quote:
+            if ch == quote:
+                quote = None
+            else:
+                buf.append(ch)
+        elif ch == '"' or ch == "'":
+            quote = ch
+            in_token = True
+        elif ch.isspace():
+            if in_token:
+                tokens.append(''.join(buf))
+                buf.clear()
+                in_token = False
+        else:
+            buf.append(ch)
+            in_token = True
+    
+    if quote:
+        raise ValueError("引号未闭合")
+    if in_token:
+        tokens.append(''.join(buf))
+    return tokens
+
+
 def _parse_port_mapping(mapping: str) -> tuple[int, int] | None:
     """解析端口映射
     
@@ -284,18 +265,17 @@ def _parse_port_mapping(mapping: str) -> tuple[int, int] | None:
         (host_port, container_port) 或 None
     """
     # 移除协议后缀
-    mapping = re.sub(r'/(tcp|udp)$', '', mapping)
+    if mapping.endswith(('/tcp', '/udp')):
+        mapping = mapping[:-4]
     
-    parts = mapping.split(':')
+    # 8080:80 或 0.0.0.0:8080:80，主机端口和容器端口总是最后两段
+    parts = mapping.split(':', 2)
+    if len(parts) < 2:
+        return None
     try:
-        if len(parts) == 2:
-            return (int(parts[0]), int(parts[1]))
-        elif len(parts) == 3:
-            # 0.0.0.0:8080:80
-            return (int(parts[1]), int(parts[2]))
+        return (int(parts[-2]), int(parts[-1]))
     except ValueError:
-        pass
-    return None
+        return None
 
 
 def _parse_env(env_str: str) -> tuple[str, str]:
@@ -306,7 +286,5 @@ def _parse_env(env_str: str) -> tuple[str, str]:
     Returns:
         (key, value)
     """
-    if '=' in env_str:
-        key, value = env_str.split('=', 1)
-        return (key.strip(), value.strip())
-    return (env_str.strip(), "")
+    key, sep, value = env_str.partition('=')
+    return (key.strip(), value.strip() if sep else "")
@@ -1,11 +1,12 @@
 """数据模型定义"""
 
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 
 
-@dataclass
+@dataclass(slots=True)
 class ContainerConfig:
     """容器配置"""
     name: str                           # 容器名称（也是路由名称）
@@ -14,6 +15,7 @@ class ContainerConfig:
     host_port: int | None = None        # 主机端口（端口映射）
     env: dict[str, str] = field(default_factory=dict)  # 环境变量
     restart_policy: str = "always"      # 重启策略
+    pull_policy: str = "missing"        # 镜像拉取策略: missing, always, never
     labels: dict[str, str] = field(default_factory=dict)  # 标签
     
     # 资源限制
@@ -24,12 +26,12 @@ class ContainerConfig:
     raw_command: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ContainerStats:
     """容器统计信息"""
     name: str
     total_requests: int = 0
-    last_access_time: datetime | None = None
+    last_access_time: float | None = None   # time.monotonic() 时间戳
     created_at: datetime | None = None
     started_at: datetime | None = None
     
@@ -38,7 +40,7 @@ class ContainerStats:
     cpu_percent: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class ContainerInfo:
     """容器完整信息"""
     name: str
@@ -49,18 +51,23 @@ class ContainerInfo:
     external_path: str | None = None    # 外部路由路径 (/mcp/{name})
     health_status: str = "unknown"      # healthy, unhealthy, unknown
     host_port: int | None = None        # 主机映射端口
-    stats: ContainerStats = field(default_factory=lambda: ContainerStats(name=""))
+    stats: ContainerStats | None = None  # 未提供时在 __post_init__ 中按名称创建
     error_message: str | None = None
+    resolved_url: str | None = None     # 缓存的代理目标 URL（生命周期变化时清空）
+    status_updated_at: float = 0.0      # 生命周期操作最近一次更新状态的 monotonic 时间
     
     def __post_init__(self):
-        if self.stats.name != self.name:
+        if self.stats is None:
+            self.stats = ContainerStats(name=self.name)
+        elif self.stats.name != self.name:
             self.stats.name = self.name
 
 
-@dataclass
+@dataclass(slots=True)
 class GatewayStatus:
     """网关状态"""
     start_time: datetime
+    start_monotonic: float = field(default_factory=time.monotonic)  # 用于计算运行时长
     total_containers: int = 0
     running_containers: int = 0
     total_requests: int = 0
@@ -4,11 +4,14 @@
 """
 
 import asyncio
+import json
 import logging
 from typing import Any, AsyncGenerator
 
 import httpx
+import websockets
 from fastapi import Request, Response, WebSocket, WebSocketDisconnect
+from starlette.background import BackgroundTask
 from starlette.responses import StreamingResponse
 
 logger = logging.getLogger(__name__)
@@ -17,33 +20,96 @@ logger = logging.getLogger(__name__)
 DEFAULT_TIMEOUT = 300.0  # 5分钟，MCP 调用可能比较慢
 DEFAULT_CONNECT_TIMEOUT = 10.0
 
+# 连接池配置：上游都是本机容器，保持足够多的长连接避免突发请求时反复建连
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 100
+KEEPALIVE_EXPIRY = 60.0
+
+# 请求体不超过该大小时先缓冲，上游返回 307/308 重定向时才能重放请求体
+MAX_BUFFERED_BODY = 1024 * 1024  # 1 MiB
+
+# 上游 WebSocket 连接配置：关闭 permessage-deflate，限制单条消息大小
+WS_MAX_MESSAGE_SIZE = 2 ** 22  # 4 MiB
+WS_PING_INTERVAL = 20.0
+
+# 不转发的 hop-by-hop 头
+_HOP_BY_HOP = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate',
+    'proxy-authorization', 'te', 'trailers', 'transfer-encoding',
+    'upgrade', 'host',
+})
+_HOP_BY_HOP_BYTES = frozenset(name.encode('latin-1') for name in _HOP_BY_HOP)
+
+
+def _error_body(message: str) -> bytes:
+    """构造 JSON 错误响应体（正确转义异常信息中的引号、换行等字符）"""
+    return json.dumps({"error": message}, ensure_ascii=False).encode()
+
+
+async def _request_content(request: Request) -> tuple[Any, bool]:
+    """准备转发的请求体
+    
+    无请求体或带有不超过 MAX_BUFFERED_BODY 的 Content-Length 时读入内存，
+    允许 httpx 跟随重定向并重放请求体；否则以流的形式转发，此时流只能读取一次，
+    不跟随重定向，3xx 响应原样返回给客户端。
+    
+    Returns:
+        (content, follow_redirects)
+    """
+    length = request.headers.get('content-length')
+    if length is None:
+        if 'transfer-encoding' not in request.headers:
+            return b"", True
+    elif length.isdigit() and int(length) <= MAX_BUFFERED_BODY:
+        return await request.body(), True
+    return request.stream(), False
+
+
+def _forward_headers(request: Request) -> httpx.Headers:
+    """复制请求头并去掉 hop-by-hop 头（保留重复头，只分配一次）"""
+    headers = httpx.Headers(request.headers.raw)
+    for name in _HOP_BY_HOP:
+        headers.pop(name, None)
+    # 响应体原样透传，不能让 httpx 补上默认的 Accept-Encoding（客户端可能不支持压缩）
+    if 'accept-encoding' not in headers:
+        headers['accept-encoding'] = 'identity'
+    return headers
+
+
+def _response_headers(response: httpx.Response) -> list[tuple[bytes, bytes]]:
+    """按原始字节过滤上游响应头，结果可直接作为 ASGI raw_headers（保留重复头）"""
+    raw_headers = []
+    for key, value in response.headers.raw:
+        # raw 保留上游原始大小写，ASGI 要求小写头名，这里只需转换一次
+        key = key.lower()
+        if key not in _HOP_BY_HOP_BYTES:
+            raw_headers.append((key, value))
+    return raw_headers
+
 
 class ProxyClient:
     """代理客户端"""
     
     def __init__(self):
-        self._client: httpx.AsyncClient | None = None
-    
-    @property
-    def client(self) -> httpx.AsyncClient:
-        """获取 HTTP 客户端（延迟初始化）"""
-        if self._client is None:
-            self._client = httpx.AsyncClient(
-                timeout=httpx.Timeout(
-                    connect=DEFAULT_CONNECT_TIMEOUT,
-                    read=DEFAULT_TIMEOUT,
-                    write=DEFAULT_TIMEOUT,
-                    pool=DEFAULT_TIMEOUT,
-                ),
-                follow_redirects=True,
-            )
-        return self._client
+        # 构造时即创建 HTTP 客户端，首个请求无需承担初始化开销
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                connect=DEFAULT_CONNECT_TIMEOUT,
+                read=DEFAULT_TIMEOUT,
+                write=DEFAULT_TIMEOUT,
+                pool=DEFAULT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            follow_redirects=True,
+        )
     
     async def close(self) -> None:
         """关闭客户端"""
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        await self.client.aclose()
     
     async def proxy_request(
         self,
@@ -59,43 +125,31 @@ class ProxyClient:
         Returns:
             Response: 响应对象
         """
-        # 构建请求 URL
-        # target_url 是基础 URL，需要加上请求路径的剩余部分
-        full_url = target_url
-        
-        # 获取查询参数
-        if request.query_params:
-            full_url += f"?{request.query_params}"
-        
         # 获取请求头（过滤掉 hop-by-hop 头）
-        headers = dict(request.headers)
-        hop_by_hop = {
-            'connection', 'keep-alive', 'proxy-authenticate',
-            'proxy-authorization', 'te', 'trailers', 'transfer-encoding',
-            'upgrade', 'host'
-        }
-        headers = {
-            k: v for k, v in headers.items()
-            if k.lower() not in hop_by_hop
-        }
-        
-        # 获取请求体
-        body = await request.body()
+        headers = _forward_headers(request)
         
-        logger.debug(
-            "代理请求: %s %s -> %s",
-            request.method,
-            request.url.path,
-            full_url
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "代理请求: %s %s -> %s",
+                request.method,
+                request.url.path,
+                target_url
+            )
         
         try:
-            # 发送请求
-            response = await self.client.request(
+            # 发送请求（大请求体以流的形式转发，不在内存中缓冲）
+            content, follow_redirects = await _request_content(request)
+            upstream_request = self.client.build_request(
                 method=request.method,
-                url=full_url,
+                url=target_url,
+                params=request.query_params.multi_items(),
                 headers=headers,
-                content=body,
+                content=content,
+            )
+            response = await self.client.send(
+                upstream_request,
+                stream=True,
+                follow_redirects=follow_redirects,
             )
             
             # 检查是否是 SSE 响应
@@ -103,38 +157,35 @@ class ProxyClient:
             if 'text/event-stream' in content_type:
                 return await self._handle_sse_response(response)
             
-            # 普通响应
-            response_headers = dict(response.headers)
-            # 移除 hop-by-hop 头
-            response_headers = {
-                k: v for k, v in response_headers.items()
-                if k.lower() not in hop_by_hop and k.lower() != 'content-encoding'
-            }
+            # 普通响应：原样转发上游字节，不解压（保留 content-encoding 和 content-length）
+            try:
+                content = b"".join([chunk async for chunk in response.aiter_raw()])
+            finally:
+                await response.aclose()
             
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=response_headers,
-            )
+            proxied = Response(content=content, status_code=response.status_code)
+            # 使用上游响应头（移除 hop-by-hop 头）
+            proxied.raw_headers = _response_headers(response)
+            return proxied
             
         except httpx.ConnectError as e:
-            logger.error("连接失败: %s -> %s", full_url, e)
+            logger.error("连接失败: %s -> %s", target_url, e)
             return Response(
-                content=f'{{"error": "容器连接失败: {e}"}}',
+                content=_error_body(f"容器连接失败: {e}"),
                 status_code=502,
                 media_type="application/json",
             )
         except httpx.TimeoutException as e:
-            logger.error("请求超时: %s", full_url)
+            logger.error("请求超时: %s", target_url)
             return Response(
-                content=f'{{"error": "请求超时"}}',
+                content=_error_body("请求超时"),
                 status_code=504,
                 media_type="application/json",
             )
         except Exception as e:
-            logger.exception("代理请求失败: %s", full_url)
+            logger.exception("代理请求失败: %s", target_url)
             return Response(
-                content=f'{{"error": "代理错误: {e}"}}',
+                content=_error_body(f"代理错误: {e}"),
                 status_code=500,
                 media_type="application/json",
             )
@@ -143,23 +194,15 @@ class ProxyClient:
         self,
         response: httpx.Response,
     ) -> StreamingResponse:
-        """处理 SSE 响应"""
-        async def generate() -> AsyncGenerator[bytes, None]:
-            async for chunk in response.aiter_bytes():
-                yield chunk
-        
-        headers = dict(response.headers)
-        headers = {
-            k: v for k, v in headers.items()
-            if k.lower() not in {'transfer-encoding', 'content-encoding'}
-        }
-        
-        return StreamingResponse(
-            generate(),
+        """处理 SSE 响应（直接转发上游字节流，发送结束后关闭上游响应）"""
+        proxied = StreamingResponse(
+            response.aiter_raw(),
             status_code=response.status_code,
-            headers=headers,
-            media_type="text/event-stream",
+            background=BackgroundTask(response.aclose),
         )
+        # 使用上游响应头（移除 hop-by-hop 头，content-type 已是 text/event-stream）
+        proxied.raw_headers = _response_headers(response)
+        return proxied
     
     async def proxy_streaming_request(
         self,
@@ -175,38 +218,28 @@ class ProxyClient:
         Returns:
             StreamingResponse: 流式响应
         """
-        full_url = target_url
-        if request.query_params:
-            full_url += f"?{request.query_params}"
-        
-        headers = dict(request.headers)
-        hop_by_hop = {
-            'connection', 'keep-alive', 'proxy-authenticate',
-            'proxy-authorization', 'te', 'trailers', 'transfer-encoding',
-            'upgrade', 'host'
-        }
-        headers = {
-            k: v for k, v in headers.items()
-            if k.lower() not in hop_by_hop
-        }
+        headers = _forward_headers(request)
         
-        body = await request.body()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("代理流式请求: %s -> %s", request.method, target_url)
         
-        logger.debug("代理流式请求: %s -> %s", request.method, full_url)
+        content, follow_redirects = await _request_content(request)
         
         async def stream_response() -> AsyncGenerator[bytes, None]:
             try:
                 async with self.client.stream(
                     method=request.method,
-                    url=full_url,
+                    url=target_url,
+                    params=request.query_params.multi_items(),
                     headers=headers,
-                    content=body,
+                    content=content,
+                    follow_redirects=follow_redirects,
                 ) as response:
                     async for chunk in response.aiter_bytes():
                         yield chunk
             except Exception as e:
                 logger.error("流式请求失败: %s", e)
-                yield f'{{"error": "{e}"}}'.encode()
+                yield _error_body(str(e))
         
         return StreamingResponse(
             stream_response(),
@@ -230,30 +263,39 @@ class WebSocketProxy:
         """
         await websocket.accept()
         
-        logger.debug("WebSocket 代理: -> %s", target_url)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("WebSocket 代理: -> %s", target_url)
         
         try:
-            import websockets
-            
-            async with websockets.connect(target_url) as target_ws:
+            async with websockets.connect(
+                target_url,
+                compression=None,
+                max_size=WS_MAX_MESSAGE_SIZE,
+                ping_interval=WS_PING_INTERVAL,
+            ) as target_ws:
                 # 双向转发
                 async def forward_to_target():
                     try:
                         while True:
-                            data = await websocket.receive_text()
-                            await target_ws.send(data)
+                            message = await websocket.receive()
+                            if message["type"] == "websocket.disconnect":
+                                break
+                            text = message.get("text")
+                            await target_ws.send(
+                                text if text is not None else message["bytes"]
+                            )
                     except WebSocketDisconnect:
                         pass
                     except Exception as e:
                         logger.debug("Forward to target error: %s", e)
                 
+                # 按消息类型选择发送方法（websockets 返回 str 或 bytes）
+                senders = {str: websocket.send_text, bytes: websocket.send_bytes}
+                
                 async def forward_to_client():
                     try:
                         async for message in target_ws:
-                            if isinstance(message, str):
-                                await websocket.send_text(message)
-                            else:
-                                await websocket.send_bytes(message)
+                            await senders[type(message)](message)
                     except Exception as e:
                         logger.debug("Forward to client error: %s", e)
                 
@@ -287,6 +329,11 @@ def get_proxy_client() -> ProxyClient:
     return _proxy_client
 
 
+async def init_proxy_client() -> ProxyClient:
+    """在应用启动时创建代理客户端"""
+    return get_proxy_client()
+
+
 def get_websocket_proxy() -> WebSocketProxy:
     """获取 WebSocket 代理单例"""
     global _websocket_proxy